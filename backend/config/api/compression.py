@@ -0,0 +1,119 @@
+"""Response compression codecs and Accept-Encoding negotiation.
+
+gzip is always available. Brotli (`pip install brotli`) and zstd
+(`pip install zstandard`) are used only when installed.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+class _GzipStream:
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Content-Encoding token -> incremental compressor class
+CODECS = {'gzip': _GzipStream}
+if brotli is not None:
+    CODECS['br'] = _BrotliStream
+if zstandard is not None:
+    CODECS['zstd'] = _ZstdStream
+
+
+def compress(codec, data, level):
+    stream = CODECS[codec](level)
+    return stream.compress(data) + stream.finish()
+
+
+# Streams flush after every chunk, like Django's compress_sequence, so each
+# chunk reaches the client as soon as the view produces it.
+
+def compress_stream(codec, chunks, level):
+    stream = CODECS[codec](level)
+    for chunk in chunks:
+        yield stream.compress(chunk) + stream.flush()
+    yield stream.finish()
+
+
+async def compress_async_stream(codec, chunks, level):
+    stream = CODECS[codec](level)
+    async for chunk in chunks:
+        yield stream.compress(chunk) + stream.flush()
+    yield stream.finish()
+
+
+def negotiate(accept_encoding, preference):
+    """Pick the codec the client rates highest (q-value), breaking ties by
+    the server `preference` order. Returns None when nothing acceptable."""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+
+    best = None
+    for rank, codec in enumerate(preference):
+        if codec not in CODECS:
+            continue
+        q = accepted.get(codec, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[0]):
+            best = (q, rank, codec)
+    return best[2] if best else None
@@ -0,0 +1,65 @@
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api import compression
+from api.models import Employee
+from api.renderers import ColumnarJSONRenderer
+from api.serializers import EmployeeSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Report compressed size, ratio and CPU time per codec for a synthetic "
+        "employee list page, in both the row and columnar encodings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Employees per page")
+        parser.add_argument('--repeat', type=int, default=20, help="Compressions per measurement")
+
+    def handle(self, *args, rows, repeat, **options):
+        departments = ['Engineering', 'HR', 'Finance', 'Sales', 'Support']
+        roles = ['Developer', 'Manager', 'Analyst', 'Recruiter', 'Lead']
+        # Unsaved instances: the benchmark needs no database
+        employees = [
+            Employee(
+                id=i, name=f"Employee {i}", email=f"employee{i}@example.com",
+                department=departments[i % 5], role=roles[i % 5], date_joined=date(2026, 1, 1 + i % 28),
+                path=f"/{i}/", version=1,
+            )
+            for i in range(1, rows + 1)
+        ]
+        payload = {
+            "success": True,
+            "status_code": 200,
+            "message": "Employees retrieved successfully",
+            "data": EmployeeSerializer(employees, many=True).data,
+        }
+        encodings = {
+            'rows': JSONRenderer().render(payload),
+            'columnar': ColumnarJSONRenderer().render(payload),
+        }
+        baseline = len(encodings['rows'])
+
+        self.stdout.write(f"{'encoding':<10}{'codec':<10}{'level':>6}{'bytes':>10}{'ratio':>8}{'ms/op':>9}")
+        for name, body in encodings.items():
+            self._row(name, 'identity', '-', len(body), baseline, 0.0)
+            for codec in compression.CODECS:
+                level = settings.RESPONSE_COMPRESSION['LEVELS'][codec]
+                started = time.process_time()
+                for _ in range(repeat):
+                    compressed = compression.compress(codec, body, level)
+                elapsed_ms = (time.process_time() - started) * 1000 / repeat
+                self._row(name, codec, level, len(compressed), baseline, elapsed_ms)
+
+        missing = sorted({'br', 'zstd'} - set(compression.CODECS))
+        if missing:
+            self.stdout.write(f"Not installed (skipped): {', '.join(missing)}")
+
+    def _row(self, encoding, codec, level, size, baseline, elapsed_ms):
+        # ratio is relative to the uncompressed row encoding
+        self.stdout.write(f"{encoding:<10}{codec:<10}{level:>6}{size:>10}{size / baseline:>8.3f}{elapsed_ms:>9.3f}")
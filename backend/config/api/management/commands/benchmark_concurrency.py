@@ -0,0 +1,88 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from api.models import Employee, VersionConflict
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one employee row from several threads and report updates/s for "
+        "optimistic concurrency (Employee.update_if_version) against a "
+        "pessimistic baseline: select_for_update() on backends with row locks, "
+        "a transaction that takes the database write lock up front on SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--iterations', type=int, default=50, help="Successful updates per worker")
+
+    def handle(self, *args, workers, iterations, **options):
+        self.workers = workers
+        self.iterations = iterations
+
+        employee = Employee.objects.create(name="", email=f"benchmark-{uuid.uuid4().hex}@example.com")
+        try:
+            # With sharding on the row lives on a shard, which may be another backend
+            self.row_locks = connections[employee._state.db].features.has_select_for_update
+            self._report(employee.pk, "optimistic (If-Match)", self._optimistic_worker)
+            self._report(employee.pk, "select_for_update" if self.row_locks else "write lock", self._locking_worker)
+        finally:
+            employee.delete()
+
+    def _report(self, pk, label, worker):
+        Employee.objects.for_pk(pk).filter(pk=pk).update(name="")
+        threads = [threading.Thread(target=worker, args=(pk,)) for _ in range(self.workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            employee = Employee.objects.for_pk(pk).get(pk=pk)
+        except Employee.DoesNotExist:
+            raise CommandError(f"Benchmark employee {pk} was deleted during the run")
+        expected = self.workers * self.iterations
+        lost = expected - len(employee.name)
+        self.stdout.write(f"{label}: {expected / elapsed:.0f} updates/s, lost updates: {lost}")
+
+    def _optimistic_worker(self, pk):
+        done = 0
+        while done < self.iterations:
+            try:
+                employee = Employee.objects.for_pk(pk).get(pk=pk)
+                employee.update_if_version(employee.version, name=employee.name + "x")
+                done += 1
+            except Employee.DoesNotExist:
+                break
+            except (VersionConflict, OperationalError):
+                pass
+        connections.close_all()
+
+    def _locking_worker(self, pk):
+        done = 0
+        while done < self.iterations:
+            try:
+                employees = Employee.objects.for_pk(pk)
+                with transaction.atomic(using=employees.db):
+                    if self.row_locks:
+                        employee = employees.select_for_update().get(pk=pk)
+                    else:
+                        # No row locks (SQLite): a no-op UPDATE takes the database
+                        # write lock before the read, like BEGIN IMMEDIATE
+                        employees.filter(pk=pk).update(name=F('name'))
+                        employee = employees.get(pk=pk)
+                    employee.name += "x"
+                    employee.save(update_fields=['name'])
+                done += 1
+            except Employee.DoesNotExist:
+                break
+            except OperationalError:
+                pass
+        connections.close_all()
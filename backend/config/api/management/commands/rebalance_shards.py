@@ -0,0 +1,107 @@
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connections, transaction
+
+from api.models import Employee, EmployeeLocation
+from api.sharding import shard_aliases, shard_for
+
+
+class Command(BaseCommand):
+    help = (
+        "Move every employee to the shard its department hashes to. Run after "
+        "changing EMPLOYEE_SHARDS, or once to move an unsharded default "
+        "database into shards (before the servers run with sharding on). "
+        "Moved employees and their direct reports "
+        "become roots of their own trees, since manager links can't cross shards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would move")
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        shards = shard_aliases()
+        if not shards:
+            raise CommandError("Sharding is disabled: set EMPLOYEE_SHARD_COUNT / EMPLOYEE_SHARDS first.")
+
+        registered = self._register_legacy(batch_size, dry_run)
+
+        moved = Counter()
+        # 'default' holds employees created before sharding was switched on
+        for source in ['default'] + shards:
+            last_pk = 0
+            while True:
+                batch = list(Employee.objects.using(source).filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                moves = defaultdict(list)
+                for employee in batch:
+                    target = shard_for(employee.department, shards)
+                    if target != source:
+                        moves[target].append(employee)
+
+                for target, employees in moves.items():
+                    if not dry_run:
+                        self._move(employees, source, target)
+                    moved[(source, target)] += len(employees)
+
+        for (source, target), count in sorted(moved.items()):
+            self.stdout.write(f"{source} -> {target}: {count}")
+        if dry_run:
+            summary = f"Would register {registered} legacy employees and move {sum(moved.values())}"
+        else:
+            summary = f"Registered {registered} legacy employees and moved {sum(moved.values())}"
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _register_legacy(self, batch_size, dry_run):
+        """Add a directory entry (shard 'default') for every employee created
+        before sharding, keeping its id, and move the directory's id sequence
+        past them. Until then the directory can hand out ids that legacy rows
+        already use."""
+        registered = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                Employee.objects.using('default').filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'email')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+
+            known = dict(EmployeeLocation.objects.filter(pk__in=[pk for pk, _ in batch]).values_list('pk', 'shard'))
+            clashes = sorted(pk for pk, shard in known.items() if shard != 'default')
+            if clashes:
+                raise CommandError(
+                    f"Legacy employees {clashes} share their ids with employees already created on a shard. "
+                    "Sharding was switched on before rebalance_shards ran; resolve these rows by hand."
+                )
+            new = [EmployeeLocation(pk=pk, email=email, shard='default') for pk, email in batch if pk not in known]
+            if not dry_run:
+                try:
+                    EmployeeLocation.objects.bulk_create(new)
+                except IntegrityError as e:
+                    raise CommandError(f"Could not register legacy employees (duplicate email across databases?): {e}")
+            registered += len(new)
+
+        if registered and not dry_run:
+            with connections['default'].cursor() as cursor:
+                for sql in connections['default'].ops.sequence_reset_sql(no_style(), [EmployeeLocation]):
+                    cursor.execute(sql)
+        return registered
+
+    def _move(self, employees, source, target):
+        for employee in employees:
+            with transaction.atomic(using=source):
+                # Re-read: an earlier move in this batch may have re-rooted it
+                employee = Employee.objects.using(source).get(pk=employee.pk)
+                # Manager links can't span shards. Detach both ends through
+                # move_to() so every subtree left behind keeps a valid path.
+                for report in Employee.objects.using(source).filter(manager=employee):
+                    report.move_to(None)
+                if employee.manager_id:
+                    employee.move_to(None)
+            employee.relocate(target)
@@ -0,0 +1,200 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import compression
+
+slow_query_logger = logging.getLogger('api.slow_queries')
+
+
+def profile_dir():
+    return Path(settings.API_PROFILING['OUTPUT_DIR'])
+
+
+class ProfilingMiddleware:
+    """Profile a single request when a staff user sends the profiling header,
+    or when the request is picked by the sampling rate.
+
+    The profiler is `API_PROFILING['PROFILER']`, any class with cProfile's
+    enable()/disable()/dump_stats(path) interface. Output goes to
+    `API_PROFILING['OUTPUT_DIR']` and is listed at /api/profiles/.
+
+    cProfile only sees the request thread: with sharding on, the shard
+    queries of a scatter-gather run in worker threads and show up only as
+    time spent waiting on the thread pool.
+    """
+
+    def __init__(self, get_response):
+        config = settings.API_PROFILING
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.header = config['HEADER']
+        self.sample_rate = config['SAMPLE_RATE']
+        self.max_files = config['MAX_FILES']
+        self.profiler_class = import_string(config['PROFILER'])
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        profiler = self.profiler_class()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        filename = f"{datetime.now():%Y%m%d-%H%M%S}-{view_name}-{uuid.uuid4().hex[:8]}.prof"
+        profile_dir().mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(profile_dir() / filename))
+        self._prune()
+        response['X-Profile-Id'] = filename
+        return response
+
+    def _should_profile(self, request):
+        if self.header in request.headers and self._is_staff(request):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _is_staff(self, request):
+        # Only authenticate when asked to profile, so normal requests pay nothing
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        return result is not None and result[0].is_staff
+
+    def _prune(self):
+        # Keep only the newest MAX_FILES dumps so sampling can't fill the disk
+        dumps = sorted(profile_dir().glob('*.prof'), key=lambda f: f.stat().st_mtime, reverse=True)
+        for stale in dumps[self.max_files:]:
+            stale.unlink(missing_ok=True)
+
+
+class SlowQueryLogMiddleware:
+    """Log every SQL statement slower than `SLOW_QUERY_LOG['THRESHOLD_MS']`
+    along with its EXPLAIN plan and the view that issued it."""
+
+    def __init__(self, get_response):
+        config = settings.SLOW_QUERY_LOG
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.threshold = config['THRESHOLD_MS'] / 1000
+
+    def __call__(self, request):
+        recorder = _SlowQueryRecorder(request, self.threshold)
+        # Every alias, so shard queries are covered too (sharding.map_shards
+        # carries these wrappers into its worker threads)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            return self.get_response(request)
+
+
+class _SlowQueryRecorder:
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+        # Shared by scatter-gather worker threads, so the re-entrancy flag is per thread
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self._local, 'explaining', False):
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if duration >= self.threshold:
+            self._record(sql, params, many, duration, context)
+        return result
+
+    def _record(self, sql, params, many, duration, context):
+        match = self.request.resolver_match
+        plan = None
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self._local.explaining = True
+            try:
+                cursor = context['connection'].cursor()
+                cursor.execute(f"{context['connection'].ops.explain_query_prefix()} {sql}", params)
+                plan = '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+            except Exception as e:
+                plan = f"EXPLAIN failed: {e}"
+            finally:
+                self._local.explaining = False
+
+        slow_query_logger.warning(
+            "Slow query (%.1f ms) on %s in view %s:\n%s\nparams=%r\nplan:\n%s",
+            duration * 1000,
+            context['connection'].alias,
+            match.view_name if match else self.request.path,
+            sql,
+            params,
+            plan,
+        )
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/Brotli/zstd compression for regular and streaming
+    responses, configured by `RESPONSE_COMPRESSION`. Works like Django's
+    GZipMiddleware but with more codecs, a size threshold and levels."""
+
+    def __init__(self, get_response):
+        config = settings.RESPONSE_COMPRESSION
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.min_size = config['MIN_SIZE']
+        self.preference = config['CODECS']
+        self.levels = config['LEVELS']
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codec = compression.negotiate(request.headers.get('Accept-Encoding', ''), self.preference)
+        if codec is None:
+            return response
+        level = self.levels[codec]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.compress_async_stream(codec, response.streaming_content, level)
+            else:
+                response.streaming_content = compression.compress_stream(codec, response.streaming_content, level)
+            # The compressed size is unknown until the stream is consumed
+            del response.headers['Content-Length']
+        else:
+            compressed = compression.compress(codec, response.content, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag must not survive a content-coding change (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codec
+        return response
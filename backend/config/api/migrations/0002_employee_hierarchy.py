@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+
+
+def populate_paths(apps, schema_editor):
+    # Existing employees have no manager yet, so each one is the root of its own tree.
+    Employee = apps.get_model('api', 'Employee')
+    Employee.objects.update(
+        path=Concat(Value('/'), Cast('id', CharField()), Value('/')),
+        depth=0,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='manager',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='direct_reports', to='api.employee'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_employee_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
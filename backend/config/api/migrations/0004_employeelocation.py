@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_employee_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('shard', models.CharField(max_length=50)),
+            ],
+        ),
+    ]
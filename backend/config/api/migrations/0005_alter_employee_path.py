@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_employeelocation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='employee',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=2048),
+        ),
+    ]
@@ -1,9 +1,66 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Length, Substr
+
+from .sharding import ShardedResults, map_shards, shard_aliases, shard_for, sharding_enabled
 
 # Create your models here.
 
 from django.db import models
 
+
+class VersionConflict(Exception):
+    """Raised when a conditional write finds the row at a different version."""
+
+
+class EmployeeLocation(models.Model):
+    """Shard directory, kept on the default database when sharding is enabled.
+
+    Inserting here allocates the employee's globally unique id, and the unique
+    email column enforces email uniqueness across all shards.
+    """
+    email = models.EmailField(unique=True)
+    shard = models.CharField(max_length=50)
+
+    def __str__(self):
+        return f"{self.email} -> {self.shard}"
+
+
+class EmployeeManager(models.Manager):
+
+    def for_pk(self, pk):
+        """Manager (or empty queryset) bound to the database holding employee `pk`."""
+        if not sharding_enabled():
+            return self
+        shard = EmployeeLocation.objects.filter(pk=pk).values_list('shard', flat=True).first()
+        return self.db_manager(shard) if shard else self.none()
+
+    def map_shards(self, fn, department=None):
+        """Run `fn(queryset)` on every shard in parallel. A department narrows
+        the fan-out to the single shard that department hashes to."""
+        if not sharding_enabled():
+            return [fn(self.all())]
+        aliases = [shard_for(department)] if department else shard_aliases()
+        return map_shards(aliases, lambda alias: fn(self.db_manager(alias).all()))
+
+    def scatter(self, build, key, reverse=False, department=None):
+        """Paginator-compatible results of `build(queryset)` across shards,
+        merge-sorted by `key`. `build` must order by the same key."""
+        if not sharding_enabled():
+            return build(self.all())
+        aliases = [shard_for(department)] if department else shard_aliases()
+        return ShardedResults(
+            {alias: build(self.db_manager(alias).all()) for alias in aliases}, key=key, reverse=reverse
+        )
+
+
+def subtree_range(path):
+    """Lookups selecting `path` and everything below it as a b-tree range seek.
+    Paths only contain digits and '/', and '0' is the character right after
+    '/', so the subtree of "/1/5/" is exactly "/1/5/" <= path < "/1/50"."""
+    return {'path__gte': path, 'path__lt': path[:-1] + '0'}
+
+
 class Employee(models.Model):
     name = models.CharField(max_length=100)  # required
     email = models.EmailField(unique=True)   # required & unique
@@ -11,6 +68,170 @@ class Employee(models.Model):
     role = models.CharField(max_length=50, blank=True, null=True)
     date_joined = models.DateField(auto_now_add=True)
 
+    # Manager hierarchy: `path` is a materialized path of ancestor ids ending
+    # with this employee's own id, e.g. "/1/5/9/". A whole subtree is then a
+    # single indexed range query, see subtree_range()
+    manager = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, blank=True, null=True, related_name='direct_reports'
+    )
+    path = models.CharField(max_length=2048, db_index=True, editable=False, default='')
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
+    # Optimistic concurrency: every write bumps the version. The API writes via
+    # update_if_version(), i.e. `UPDATE ... WHERE id=? AND version=?`, so a stale
+    # writer updates zero rows instead of silently overwriting someone else's
+    # change. Plain save() still bumps the version but does not check it.
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = EmployeeManager()
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored manager so save() can tell when it changes
+        instance._loaded_manager_id = instance.__dict__.get('manager_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        manager_changed = (
+            not creating
+            and (update_fields is None or 'manager' in update_fields or 'manager_id' in update_fields)
+            and self.manager_id != getattr(self, '_loaded_manager_id', self.manager_id)
+        )
+        location = None
+        if creating and self.pk is None and sharding_enabled():
+            location = EmployeeLocation.objects.create(email=self.email, shard=shard_for(self.department))
+            self.pk = location.pk
+            kwargs['using'] = location.shard
+        if not creating:
+            # path/depth are owned by move_to() and the subtree rewrites, which
+            # update them in SQL; the values on this instance may be stale.
+            fields = update_fields if update_fields is not None else [
+                f.name for f in self._meta.concrete_fields if not f.primary_key
+            ]
+            kwargs['update_fields'] = [f for f in fields if f not in ('path', 'depth', 'version')]
+        bump_version = not creating and bool(kwargs['update_fields'])
+        loaded_version = self.version
+
+        try:
+            with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Employee, instance=self)):
+                if manager_changed:
+                    # Re-parent the subtree first; this also refreshes self.path/depth
+                    self.move_to(self.manager)
+                if bump_version:
+                    # Unconditional, but still invalidates every ETag handed out so far
+                    self.version = F('version') + 1
+                    kwargs['update_fields'].append('version')
+                super().save(*args, **kwargs)
+                if bump_version:
+                    self.refresh_from_db(using=self._state.db, fields=['version'])
+                if creating:
+                    prefix = self.manager.path if self.manager_id else '/'
+                    self.path = f"{prefix}{self.pk}/"
+                    self.depth = self.manager.depth + 1 if self.manager_id else 0
+                    self._same_db().filter(pk=self.pk).update(path=self.path, depth=self.depth)
+                    self._loaded_manager_id = self.manager_id
+        except Exception:
+            self.version = loaded_version
+            if location is not None:
+                location.delete()
+            raise
+
+    def delete(self, *args, **kwargs):
+        # Promote this employee's reports to their manager before removing them,
+        # so the subtree keeps a consistent path.
+        with transaction.atomic(using=self._state.db):
+            self._same_db().filter(manager=self).update(manager=self.manager)
+            self._rewrite_subtree_prefix(self.manager.path if self.manager_id else '/', -1)
+            pk = self.pk
+            result = super().delete(*args, **kwargs)
+        if sharding_enabled():
+            EmployeeLocation.objects.filter(pk=pk).delete()
+        return result
+
+    def update_if_version(self, expected_version, **fields):
+        """Write `fields` in one conditional UPDATE, raising VersionConflict if stale."""
+        with transaction.atomic():
+            if sharding_enabled() and 'email' in fields:
+                # Directory first, so a duplicate email on another shard fails the
+                # write; a version conflict below rolls it back.
+                EmployeeLocation.objects.filter(pk=self.pk).update(email=fields['email'])
+            rows = self._same_db().filter(pk=self.pk, version=expected_version).update(
+                version=F('version') + 1, **fields
+            )
+            if not rows:
+                raise VersionConflict()
+        for attr, value in fields.items():
+            setattr(self, attr, value)
+        self.version = expected_version + 1
+
+    def delete_if_version(self, expected_version):
+        with transaction.atomic(using=self._state.db):
+            # The conditional bump both checks the version and locks the row
+            # until the delete commits.
+            self.update_if_version(expected_version)
+            return self.delete()
+
+    def relocate(self, alias):
+        """Move this employee's row to shard `alias` and point the directory at it.
+
+        Cross-shard manager links are impossible, so the employee must already
+        be a root without direct reports; callers detach them first.
+        """
+        source = self._state.db
+        with transaction.atomic(using='default'), transaction.atomic(using=alias), transaction.atomic(using=source):
+            location = EmployeeLocation.objects.select_for_update().filter(pk=self.pk).first()
+            if location is not None and location.shard != source:
+                # The id belongs to an employee on another database (e.g. a legacy
+                # row that was never registered); don't steal its directory entry.
+                raise ValueError(f"Employee {self.pk} on {source} is registered on {location.shard}")
+            row = Employee.objects.using(source).get(pk=self.pk)
+            Employee.objects.using(alias).bulk_create([row])
+            if location is None:
+                EmployeeLocation.objects.create(pk=self.pk, email=row.email, shard=alias)
+            else:
+                location.email, location.shard = row.email, alias
+                location.save()
+            Employee.objects.using(source).filter(pk=self.pk).delete()
+        self._state.db = alias
+
+    def ancestor_ids(self):
+        """Ids of the reporting chain from the root down to (excluding) this employee."""
+        return [int(part) for part in self.path.strip('/').split('/')[:-1] if part]
+
+    def is_descendant_of(self, other):
+        return other.pk != self.pk and self.path.startswith(other.path)
+
+    def move_to(self, new_manager):
+        """Re-parent this employee and their whole subtree in a single UPDATE."""
+        if new_manager is not None and (new_manager.pk == self.pk or new_manager.is_descendant_of(self)):
+            raise ValueError("An employee cannot report to themselves or to someone in their subtree")
+
+        with transaction.atomic(using=self._state.db):
+            new_prefix = f"{new_manager.path if new_manager else '/'}{self.pk}/"
+            new_depth = new_manager.depth + 1 if new_manager else 0
+            self._same_db().filter(pk=self.pk).update(manager=new_manager)
+            self._rewrite_subtree_prefix(new_prefix, new_depth - self.depth, include_self=True)
+            self.manager = new_manager
+            self.path = new_prefix
+            self.depth = new_depth
+            self._loaded_manager_id = self.manager_id
+
+    def _rewrite_subtree_prefix(self, new_prefix, depth_delta, include_self=False):
+        # Swap this employee's path prefix for `new_prefix` on every descendant
+        # (and optionally the employee), without loading any of the rows.
+        subtree = self._same_db().filter(**subtree_range(self.path))
+        if not include_self:
+            subtree = subtree.exclude(pk=self.pk)
+        subtree.update(
+            path=Concat(Value(new_prefix), Substr('path', len(self.path) + 1, Length('path'))),
+            depth=F('depth') + depth_delta,
+        )
+
+    def _same_db(self):
+        return Employee.objects.db_manager(self._state.db)
@@ -0,0 +1,34 @@
+from rest_framework.renderers import JSONRenderer
+
+
+def to_columnar(data):
+    """Rewrite every `data` list of objects as {"columns": [...], "rows": [[...]]},
+    so keys are sent once per response instead of once per row."""
+    if isinstance(data, dict):
+        return {
+            key: _columns(value) if key == 'data' else to_columnar(value)
+            for key, value in data.items()
+        }
+    return data
+
+
+def _columns(rows):
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        return rows
+    columns = list(rows[0].keys())
+    return {
+        "columns": columns,
+        "rows": [[row.get(column) for column in columns] for row in rows],
+    }
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSON with list payloads in columnar form.
+
+    Selected with `Accept: application/vnd.habot.columnar+json` or `?format=columnar`.
+    """
+    media_type = 'application/vnd.habot.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columnar(data), accepted_media_type, renderer_context)
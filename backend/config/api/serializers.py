@@ -1,8 +1,94 @@
+from contextlib import ExitStack
+
+from django.db import transaction
 from rest_framework import serializers
-from .models import Employee
+from .models import Employee, EmployeeLocation
+from .sharding import shard_for, sharding_enabled
+
+
+class EmployeeRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves an employee pk on whichever shard holds that employee."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return Employee.objects.for_pk(data).get(pk=data)
+        except Employee.DoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
 
 class EmployeeSerializer(serializers.ModelSerializer):
+    manager = EmployeeRelatedField(queryset=Employee.objects.all(), allow_null=True, required=False)
+
     class Meta:
         model = Employee
-        fields = ['id', 'name', 'email', 'department', 'role', 'date_joined',]
-        read_only_fields = ['id', 'date_joined']  # auto-generated fields
+        fields = ['id', 'name', 'email', 'department', 'role', 'date_joined', 'manager', 'depth', 'version',]
+        read_only_fields = ['id', 'date_joined', 'depth', 'version']  # auto-generated fields
+
+    def validate_email(self, email):
+        # With sharding the model's unique constraint only covers one shard;
+        # the shard directory is the global source of truth.
+        if sharding_enabled():
+            taken = EmployeeLocation.objects.filter(email=email)
+            if self.instance is not None:
+                taken = taken.exclude(pk=self.instance.pk)
+            if taken.exists():
+                raise serializers.ValidationError("employee with this email already exists.")
+        return email
+
+    def validate_manager(self, manager):
+        if manager is not None and self.instance is not None:
+            if manager.pk == self.instance.pk or manager.is_descendant_of(self.instance):
+                raise serializers.ValidationError(
+                    "An employee cannot report to themselves or to someone in their subtree."
+                )
+        return manager
+
+    def validate(self, attrs):
+        if not sharding_enabled():
+            return attrs
+
+        department = attrs['department'] if 'department' in attrs else getattr(self.instance, 'department', None)
+        manager = attrs.get('manager')
+        if manager is not None and manager._state.db != shard_for(department):
+            raise serializers.ValidationError({
+                "manager": ["Manager must be in a department stored on the same shard as this employee."]
+            })
+
+        # A department change that moves the employee to another shard can't
+        # carry manager links along, so they have to be resolved explicitly.
+        if self.instance is not None and shard_for(department) != self.instance._state.db:
+            if Employee.objects.using(self.instance._state.db).filter(manager=self.instance).exists():
+                raise serializers.ValidationError({
+                    "department": ["Reassign this employee's direct reports before moving them to a department on another shard."]
+                })
+            if self.instance.manager_id and 'manager' not in attrs:
+                raise serializers.ValidationError({
+                    "manager": ["Set a manager on the new shard (or null) when moving to a department on another shard."]
+                })
+        return attrs
+
+    def update(self, instance, validated_data):
+        # The view passes the client's If-Match/version; without one we still
+        # guard against writes that landed since `instance` was read.
+        expected_version = self.context.get('expected_version') or instance.version
+        manager = validated_data.pop('manager', instance.manager)
+        source = instance._state.db
+        target = shard_for(validated_data.get('department', instance.department)) if sharding_enabled() else source
+
+        with ExitStack() as stack:
+            # One transaction per database touched: source shard, target shard, directory
+            for alias in dict.fromkeys([source, target, 'default']):
+                stack.enter_context(transaction.atomic(using=alias))
+
+            instance.update_if_version(expected_version, **validated_data)
+            if target != source:
+                if instance.manager_id:
+                    instance.move_to(None)
+                instance.relocate(target)
+            if manager != instance.manager:
+                instance.move_to(manager)
+        return instance
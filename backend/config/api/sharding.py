@@ -0,0 +1,116 @@
+"""Optional horizontal sharding of employees across database aliases.
+
+Sharding is enabled by listing aliases in `settings.EMPLOYEE_SHARDS`. New
+employees are placed on a shard by a stable hash of their department, and
+an `EmployeeLocation` row in the default database records where each one
+lives. That directory hands out globally unique ids and enforces email
+uniqueness across shards. With no shards configured everything runs against
+the default database exactly as before.
+"""
+import heapq
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections
+
+
+def shard_aliases():
+    return list(getattr(settings, 'EMPLOYEE_SHARDS', []))
+
+
+def sharding_enabled():
+    return bool(shard_aliases())
+
+
+def shard_for(department, shards=None):
+    """Stable (process-independent) shard for a department, case-insensitive
+    to match the `department__iexact` filters used by the views."""
+    shards = shards or shard_aliases()
+    key = (department or '').strip().lower().encode()
+    return shards[zlib.crc32(key) % len(shards)]
+
+
+def map_shards(aliases, fn):
+    """Run `fn(alias)` for every alias in parallel and return the results in order."""
+    if len(aliases) == 1:
+        return [fn(aliases[0])]
+
+    # Connections are per thread, so carry the caller's execute wrappers (e.g.
+    # the slow query log) over to the worker threads' connections
+    wrappers = {alias: list(connections[alias].execute_wrappers) for alias in aliases}
+
+    def run(alias):
+        with ExitStack() as stack:
+            for wrapper in wrappers[alias]:
+                stack.enter_context(connections[alias].execute_wrapper(wrapper))
+            try:
+                return fn(alias)
+            finally:
+                # Worker threads get their own connections; don't leak them
+                connections[alias].close()
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return list(pool.map(run, aliases))
+
+
+class ShardedResults:
+    """Read-only, paginator-compatible view over one ordered queryset per shard.
+
+    `count()` sums the shard counts and slicing fetches at most `stop` rows
+    from each shard in parallel, then merge-sorts them by `key`.
+    """
+
+    def __init__(self, querysets, key, reverse=False):
+        self.querysets = querysets
+        self.key = key
+        self.reverse = reverse
+
+    def count(self):
+        return sum(map_shards(list(self.querysets), lambda alias: self.querysets[alias].count()))
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError("ShardedResults only supports contiguous slices")
+        start, stop = index.start or 0, index.stop
+        rows = map_shards(
+            list(self.querysets),
+            lambda alias: list(self.querysets[alias] if stop is None else self.querysets[alias][:stop]),
+        )
+        merged = heapq.merge(*rows, key=self.key, reverse=self.reverse)
+        return list(islice(merged, start, stop))
+
+
+class EmployeeShardRouter:
+    """Keep the shard directory on the default database and only create the
+    employee table on shard aliases. Per-row routing is explicit: callers use
+    `Employee.objects.for_pk()` or the instance's own `_state.db`."""
+
+    def db_for_read(self, model, **hints):
+        return self._instance_db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._instance_db(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.model_name == 'employee' and obj2._meta.model_name == 'employee':
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name == 'employeelocation':
+            return db == 'default'
+        if db in shard_aliases():
+            return app_label == 'api' and model_name == 'employee'
+        return None
+
+    def _instance_db(self, model, hints):
+        instance = hints.get('instance')
+        if model._meta.model_name == 'employee' and instance is not None and instance._state.db:
+            return instance._state.db
+        return None
@@ -1,11 +1,30 @@
+import gzip
+import io
+import json
+import tempfile
+import threading
+import zlib
+from datetime import date
+from pathlib import Path
+
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Employee
+from .compression import compress_stream, negotiate
+from .middleware import CompressionMiddleware
+from .models import Employee, EmployeeLocation, VersionConflict
+from .sharding import shard_for
 
 
+@override_settings(EMPLOYEE_SHARDS=[])  # unsharded even if EMPLOYEE_SHARD_COUNT is set
 class EmployeeAPITestCase(APITestCase):
 
     def setUp(self):
@@ -124,6 +143,116 @@ class EmployeeAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertFalse(response.data["success"])
 
+    # ----------------------
+    # HIERARCHY TESTS
+    # ----------------------
+    def _build_org(self):
+        ceo = Employee.objects.create(name="CEO", email="ceo@test.com", department="Exec")
+        vp = Employee.objects.create(name="VP", email="vp@test.com", department="Engineering", manager=ceo)
+        dev = Employee.objects.create(name="Dev", email="dev@test.com", department="Engineering", role="Developer", manager=vp)
+        hr = Employee.objects.create(name="HR", email="hr@test.com", department="HR", manager=ceo)
+        return ceo, vp, dev, hr
+
+    def test_employee_direct_reports(self):
+        ceo, vp, dev, hr = self._build_org()
+        response = self.client.get(f"/api/employees/{ceo.id}/reports/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({e["id"] for e in response.data["data"]}, {vp.id, hr.id})
+
+    def test_employee_subtree_filter(self):
+        ceo, vp, dev, hr = self._build_org()
+        response = self.client.get(f"/api/employees/{ceo.id}/subtree/?department=Engineering")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual({e["id"] for e in response.data["results"]["data"]}, {vp.id, dev.id})
+
+    def test_employee_reporting_chain(self):
+        ceo, vp, dev, hr = self._build_org()
+        response = self.client.get(f"/api/employees/{dev.id}/chain/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([e["id"] for e in response.data["data"]], [vp.id, ceo.id])
+
+    def test_move_manager_reparents_subtree(self):
+        ceo, vp, dev, hr = self._build_org()
+        response = self.client.patch(f"/api/employees/{vp.id}/update/", {"manager": hr.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        dev.refresh_from_db()
+        self.assertEqual(dev.path, f"/{ceo.id}/{hr.id}/{vp.id}/{dev.id}/")
+        self.assertEqual(dev.depth, 3)
+
+    def test_orm_manager_change_reparents_subtree(self):
+        ceo, vp, dev, hr = self._build_org()
+        vp.manager = hr
+        vp.save()
+        dev.refresh_from_db()
+        self.assertEqual(dev.path, f"/{ceo.id}/{hr.id}/{vp.id}/{dev.id}/")
+        self.assertEqual(dev.depth, 3)
+
+    def test_stale_instance_save_keeps_moved_path(self):
+        ceo, vp, dev, hr = self._build_org()
+        stale_dev = Employee.objects.get(pk=dev.pk)
+        vp.manager = hr
+        vp.save()
+        stale_dev.role = "Senior Developer"
+        stale_dev.save()
+        dev.refresh_from_db()
+        self.assertEqual(dev.path, f"/{ceo.id}/{hr.id}/{vp.id}/{dev.id}/")
+        self.assertEqual(dev.depth, 3)
+
+    def test_move_manager_into_own_subtree_rejected(self):
+        ceo, vp, dev, hr = self._build_org()
+        response = self.client.patch(f"/api/employees/{vp.id}/update/", {"manager": dev.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("manager", response.data["errors"])
+
+    def test_delete_manager_promotes_reports(self):
+        ceo, vp, dev, hr = self._build_org()
+        self.client.delete(f"/api/employees/{vp.id}/delete/")
+        dev.refresh_from_db()
+        self.assertEqual(dev.manager_id, ceo.id)
+        self.assertEqual(dev.path, f"/{ceo.id}/{dev.id}/")
+        self.assertEqual(dev.depth, 1)
+
+    # ----------------------
+    # OPTIMISTIC CONCURRENCY TESTS
+    # ----------------------
+    def test_employee_update_with_matching_version(self):
+        emp = Employee.objects.create(name="Versioned", email="v@test.com")
+        response = self.client.patch(f"/api/employees/{emp.id}/update/", {"role": "Lead"}, format="json", HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["version"], 2)
+        self.assertEqual(response["ETag"], '"2"')
+
+    def test_employee_update_stale_version_conflict(self):
+        emp = Employee.objects.create(name="Versioned", email="v@test.com")
+        self.client.patch(f"/api/employees/{emp.id}/update/", {"role": "Lead"}, format="json", HTTP_IF_MATCH='"1"')
+        response = self.client.patch(f"/api/employees/{emp.id}/update/", {"role": "Intern"}, format="json", HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data["data"]["role"], "Lead")
+        emp.refresh_from_db()
+        self.assertEqual(emp.role, "Lead")
+
+    def test_employee_delete_stale_version_conflict(self):
+        emp = Employee.objects.create(name="Versioned", email="v@test.com")
+        Employee.objects.filter(pk=emp.pk).update(version=F("version") + 1)
+        response = self.client.delete(f"/api/employees/{emp.id}/delete/", HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(Employee.objects.count(), 1)
+
+    def test_employee_update_malformed_if_match(self):
+        emp = Employee.objects.create(name="Versioned", email="v@test.com")
+        response = self.client.patch(f"/api/employees/{emp.id}/update/", {"role": "Lead"}, format="json", HTTP_IF_MATCH='"abc"')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["message"], "Invalid version")
+
+    def test_orm_save_bumps_version(self):
+        emp = Employee.objects.create(name="Versioned", email="v@test.com")
+        emp.role = "Lead"
+        emp.save()
+        self.assertEqual(emp.version, 2)
+        response = self.client.patch(f"/api/employees/{emp.id}/update/", {"role": "Intern"}, format="json", HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
     # ----------------------
     # UNAUTHORIZED ACCESS TEST
     # ----------------------
@@ -131,3 +260,310 @@ class EmployeeAPITestCase(APITestCase):
         self.client.credentials()  # Remove token
         response = self.client.get(self.employee_list_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(EMPLOYEE_SHARDS=[])  # unsharded even if EMPLOYEE_SHARD_COUNT is set
+class EmployeeConcurrencyStressTestCase(TransactionTestCase):
+    """Concurrent read-modify-write on one hot row through
+    Employee.update_if_version(): every worker appends one character to
+    `name`, so a lost update shows up as a short name. Throughput against a
+    row-locking baseline is measured by `manage.py benchmark_concurrency`."""
+
+    workers = 4
+    iterations = 20
+
+    def _worker(self, pk):
+        done = 0
+        while done < self.iterations:
+            try:
+                emp = Employee.objects.get(pk=pk)
+                emp.update_if_version(emp.version, name=emp.name + "x")
+                done += 1
+            except (VersionConflict, OperationalError):
+                pass  # lost the race (or SQLite table lock), re-read and retry
+        connection.close()
+
+    def test_no_lost_updates(self):
+        emp = Employee.objects.create(name="", email="hot@test.com")
+        threads = [threading.Thread(target=self._worker, args=(emp.pk,)) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        emp.refresh_from_db()
+        self.assertEqual(len(emp.name), self.workers * self.iterations)
+        self.assertEqual(emp.version, 1 + self.workers * self.iterations)
+
+
+@override_settings(EMPLOYEE_SHARDS=[])  # unsharded even if EMPLOYEE_SHARD_COUNT is set
+class ProfilingAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", password="Admin@123", is_staff=True)
+        self.user = User.objects.create_user(username="testuser", password="Test@123")
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        self.profiling = override_settings(API_PROFILING={
+            **settings.API_PROFILING, "ENABLED": True, "OUTPUT_DIR": self.profile_dir.name,
+        })
+        self.profiling.enable()
+        self.addCleanup(self.profiling.disable)
+
+    def _authenticate(self, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_profile_header_from_staff_user_is_captured_and_listed(self):
+        self._authenticate(self.admin)
+        response = self.client.get("/api/employees/", HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("employee-list", response["X-Profile-Id"])
+
+        response = self.client.get("/api/profiles/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["data"]), 1)
+
+    def test_profile_header_from_regular_user_is_ignored(self):
+        self._authenticate(self.user)
+        response = self.client.get("/api/employees/", HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(self.client.get("/api/profiles/").status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_profile_header_from_regular_user_still_sampled(self):
+        with override_settings(API_PROFILING={**settings.API_PROFILING, "ENABLED": True, "SAMPLE_RATE": 1.0, "OUTPUT_DIR": self.profile_dir.name}):
+            self._authenticate(self.user)
+            response = self.client.get("/api/employees/", HTTP_X_PROFILE="1")
+        self.assertIn("X-Profile-Id", response)
+
+    def test_profile_retention_cap(self):
+        with override_settings(API_PROFILING={**settings.API_PROFILING, "ENABLED": True, "MAX_FILES": 2, "OUTPUT_DIR": self.profile_dir.name}):
+            self._authenticate(self.admin)
+            for _ in range(4):
+                self.client.get("/api/roles/", HTTP_X_PROFILE="1")
+        self.assertEqual(len(list(Path(self.profile_dir.name).glob("*.prof"))), 2)
+
+    @override_settings(SLOW_QUERY_LOG={"ENABLED": True, "THRESHOLD_MS": 0})
+    def test_slow_query_log_records_plan_and_view(self):
+        self._authenticate(self.user)
+        with self.assertLogs("api.slow_queries", level="WARNING") as logs:
+            self.client.get("/api/employees/?department=HR")
+        employee_queries = [line for line in logs.output if "api_employee" in line]
+        self.assertTrue(employee_queries)
+        self.assertIn("employee-list", employee_queries[0])
+        self.assertIn("plan:", employee_queries[0])
+
+
+@override_settings(EMPLOYEE_SHARDS=["shard_0", "shard_1", "shard_2"])
+class EmployeeShardingTestCase(TransactionTestCase):
+    databases = "__all__"
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="Test@123")
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        # Two departments that hash to different shards
+        departments = [f"Dept{i}" for i in range(20)]
+        self.dept_a = departments[0]
+        self.dept_b = next(d for d in departments if shard_for(d) != shard_for(self.dept_a))
+
+    def _create(self, name, email, department):
+        return self.client.post("/api/employees/create/", {"name": name, "email": email, "department": department}, format="json")
+
+    def test_create_routes_by_department_with_global_ids(self):
+        a = self._create("A", "a@test.com", self.dept_a).data["data"]
+        b = self._create("B", "b@test.com", self.dept_b).data["data"]
+        self.assertNotEqual(a["id"], b["id"])
+        self.assertTrue(Employee.objects.using(shard_for(self.dept_a)).filter(pk=a["id"]).exists())
+        self.assertTrue(Employee.objects.using(shard_for(self.dept_b)).filter(pk=b["id"]).exists())
+        self.assertFalse(Employee.objects.using("default").exists())
+
+        response = self.client.get(f"/api/employees/{b['id']}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["email"], "b@test.com")
+
+    def test_email_unique_across_shards(self):
+        self._create("A", "same@test.com", self.dept_a)
+        response = self._create("B", "same@test.com", self.dept_b)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data["errors"])
+
+    def test_list_merges_shards_by_date_joined(self):
+        for i, department in enumerate([self.dept_a, self.dept_b, self.dept_a, self.dept_b]):
+            emp_id = self._create(f"E{i}", f"e{i}@test.com", department).data["data"]["id"]
+            Employee.objects.using(shard_for(department)).filter(pk=emp_id).update(date_joined=date(2026, 1, i + 1))
+
+        response = self.client.get("/api/employees/")
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual([e["name"] for e in response.data["results"]["data"]], ["E3", "E2", "E1", "E0"])
+
+        response = self.client.get(f"/api/employees/?department={self.dept_a}")
+        self.assertEqual([e["name"] for e in response.data["results"]["data"]], ["E2", "E0"])
+
+    def test_update_and_delete_on_owning_shard(self):
+        emp_id = self._create("A", "a@test.com", self.dept_b).data["data"]["id"]
+        response = self.client.patch(f"/api/employees/{emp_id}/update/", {"role": "Lead"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Employee.objects.using(shard_for(self.dept_b)).get(pk=emp_id).role, "Lead")
+
+        response = self.client.delete(f"/api/employees/{emp_id}/delete/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(EmployeeLocation.objects.filter(pk=emp_id).exists())
+
+    def test_department_change_moves_row_to_new_shard(self):
+        emp_id = self._create("A", "a@test.com", self.dept_a).data["data"]["id"]
+        response = self.client.patch(f"/api/employees/{emp_id}/update/", {"department": self.dept_b}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertFalse(Employee.objects.using(shard_for(self.dept_a)).filter(pk=emp_id).exists())
+        self.assertEqual(EmployeeLocation.objects.get(pk=emp_id).shard, shard_for(self.dept_b))
+        response = self.client.get(f"/api/employees/?department={self.dept_b}")
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(self.client.get(f"/api/employees/{emp_id}/").data["data"]["version"], 2)
+
+    def test_department_change_with_reports_rejected(self):
+        boss = self._create("Boss", "boss@test.com", self.dept_a).data["data"]
+        self.client.post("/api/employees/create/", {"name": "R", "email": "r@test.com", "department": self.dept_a, "manager": boss["id"]}, format="json")
+        response = self.client.patch(f"/api/employees/{boss['id']}/update/", {"department": self.dept_b}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("department", response.data["errors"])
+
+    def test_manager_on_same_shard(self):
+        boss = self._create("Boss", "boss@test.com", self.dept_a).data["data"]
+        response = self.client.post("/api/employees/create/", {"name": "R", "email": "r@test.com", "department": self.dept_a, "manager": boss["id"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        report = Employee.objects.using(shard_for(self.dept_a)).get(pk=response.data["data"]["id"])
+        self.assertEqual(report.path, f"/{boss['id']}/{report.pk}/")
+
+        other = self._create("Other", "other@test.com", self.dept_a).data["data"]
+        response = self.client.patch(f"/api/employees/{other['id']}/update/", {"manager": boss["id"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["depth"], 1)
+
+    def test_manager_on_other_shard_rejected(self):
+        boss = self._create("Boss", "boss@test.com", self.dept_a).data["data"]
+        response = self.client.post("/api/employees/create/", {"name": "R", "email": "r@test.com", "department": self.dept_b, "manager": boss["id"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("same shard", str(response.data["errors"]["manager"]))
+
+    def test_slow_query_log_covers_scatter_gather_threads(self):
+        # Through the ORM: the client loads its middleware on its first request
+        Employee.objects.create(name="A", email="a@test.com", department=self.dept_a)
+        with self.assertLogs("api.slow_queries", level="WARNING") as logs:
+            with override_settings(SLOW_QUERY_LOG={"ENABLED": True, "THRESHOLD_MS": 0}):
+                self.client.get("/api/employees/")
+        shard_queries = [line for line in logs.output if "on shard_" in line and "employee-list" in line]
+        self.assertEqual({line.split(" on ")[1].split()[0] for line in shard_queries}, {"shard_0", "shard_1", "shard_2"})
+
+    def test_rebalance_moves_rows_to_hashed_shard(self):
+        # A legacy row in the unsharded default database, moved before any sharded write
+        Employee.objects.using("default").bulk_create([Employee(name="Legacy", email="legacy@test.com", department=self.dept_a)])
+        call_command("rebalance_shards", stdout=io.StringIO())
+
+        self.assertFalse(Employee.objects.using("default").exists())
+        legacy = Employee.objects.using(shard_for(self.dept_a)).get(email="legacy@test.com")
+        self.assertEqual(EmployeeLocation.objects.get(pk=legacy.pk).shard, shard_for(self.dept_a))
+
+        # New ids come after the legacy ones; a row on the wrong shard is moved
+        misplaced = self._create("Moved", "moved@test.com", self.dept_a).data["data"]["id"]
+        self.assertGreater(misplaced, legacy.pk)
+        Employee.objects.using(shard_for(self.dept_a)).filter(pk=misplaced).update(department=self.dept_b)
+        call_command("rebalance_shards", stdout=io.StringIO())
+
+        self.assertTrue(Employee.objects.using(shard_for(self.dept_b)).filter(pk=misplaced).exists())
+        self.assertEqual(EmployeeLocation.objects.get(pk=misplaced).shard, shard_for(self.dept_b))
+
+    def test_rebalance_refuses_legacy_ids_taken_by_sharded_rows(self):
+        # Sharding switched on before the legacy rows were registered: the
+        # directory hands out an id that a legacy row already uses
+        sharded = self._create("New", "new@test.com", self.dept_b).data["data"]["id"]
+        Employee.objects.using("default").bulk_create([Employee(pk=sharded, name="Legacy", email="legacy@test.com", department=self.dept_a)])
+        legacy = Employee.objects.using("default").get()
+
+        with self.assertRaises(CommandError):
+            call_command("rebalance_shards", stdout=io.StringIO())
+        with self.assertRaises(ValueError):
+            legacy.relocate(shard_for(self.dept_a))
+        self.assertEqual(EmployeeLocation.objects.get(pk=sharded).shard, shard_for(self.dept_b))
+        self.assertEqual(Employee.objects.using(shard_for(self.dept_b)).get(pk=sharded).email, "new@test.com")
+
+    def test_rebalance_reroots_reports_left_behind(self):
+        boss = self._create("Boss", "boss@test.com", self.dept_a).data["data"]["id"]
+
+        def create(name, manager):
+            payload = {"name": name, "email": f"{name}@test.com", "department": self.dept_a, "manager": manager}
+            return self.client.post("/api/employees/create/", payload, format="json").data["data"]["id"]
+
+        report = create("report", boss)
+        sub_report = create("sub", report)
+        Employee.objects.using(shard_for(self.dept_a)).filter(pk=boss).update(department=self.dept_b)
+
+        call_command("rebalance_shards", stdout=io.StringIO())
+
+        shard_a = Employee.objects.using(shard_for(self.dept_a))
+        self.assertEqual(Employee.objects.using(shard_for(self.dept_b)).get(pk=boss).path, f"/{boss}/")
+        left = shard_a.get(pk=report)
+        self.assertEqual((left.manager_id, left.path, left.depth), (None, f"/{report}/", 0))
+        sub = shard_a.get(pk=sub_report)
+        self.assertEqual((sub.manager_id, sub.path, sub.depth), (report, f"/{report}/{sub_report}/", 1))
+
+
+@override_settings(EMPLOYEE_SHARDS=[])  # unsharded even if EMPLOYEE_SHARD_COUNT is set
+class CompressionAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="Test@123")
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        for i in range(10):
+            Employee.objects.create(name=f"Emp{i}", email=f"e{i}@test.com", department="Engineering", role="Developer")
+
+    def test_list_gzip_when_accepted(self):
+        response = self.client.get("/api/employees/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        body = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(body["results"]["data"]), 10)
+
+    def test_no_compression_without_accept_encoding(self):
+        response = self.client.get("/api/employees/")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_small_response_below_threshold_not_compressed(self):
+        response = self.client.get("/api/roles/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming_response_compressed(self):
+        chunks = [b'{"id": %d, "name": "Employee"}\n' % i for i in range(100)]
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(iter(chunks)))
+        response = middleware(RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), b"".join(chunks))
+
+    def test_streaming_emits_compressed_chunk_per_input_chunk(self):
+        chunks = [b"x" * 100 for _ in range(5)]
+        decompressor = zlib.decompressobj(31)
+        compressed = compress_stream("gzip", iter(chunks), 6)
+        for chunk in chunks:
+            # Every input chunk is decodable as soon as its output arrives
+            self.assertEqual(decompressor.decompress(next(compressed)), chunk)
+        decompressor.decompress(b"".join(compressed))
+        self.assertTrue(decompressor.eof)
+
+    def test_negotiate_respects_q_values(self):
+        self.assertEqual(negotiate("gzip;q=1.0, identity;q=0.5", ["zstd", "br", "gzip"]), "gzip")
+        self.assertIsNone(negotiate("gzip;q=0", ["gzip"]))
+        self.assertIsNone(negotiate("", ["gzip"]))
+
+    def test_columnar_list_encoding(self):
+        response = self.client.get("/api/employees/?format=columnar")
+        self.assertEqual(response["Content-Type"], "application/vnd.habot.columnar+json")
+        data = json.loads(response.content)["results"]["data"]
+        self.assertEqual(data["columns"][:3], ["id", "name", "email"])
+        self.assertEqual(len(data["rows"]), 10)
+        self.assertEqual(data["rows"][0][4], "Developer")
+
+    def test_columnar_selected_by_accept_header(self):
+        response = self.client.get("/api/employees/", HTTP_ACCEPT="application/vnd.habot.columnar+json")
+        self.assertIn("columns", json.loads(response.content)["results"]["data"])
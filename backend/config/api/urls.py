@@ -7,8 +7,13 @@ from .views import (
     employee_detail,
     employee_update,
     employee_delete,
+    employee_direct_reports,
+    employee_subtree,
+    employee_reporting_chain,
     departments_list,
-    roles_list
+    roles_list,
+    profiles_list,
+    profile_download,
 )
 
 urlpatterns = [
@@ -19,6 +24,11 @@ urlpatterns = [
     path('employees/<int:pk>/', employee_detail, name='employee-detail'),
     path('employees/<int:pk>/update/', employee_update, name='employee-update'),
     path('employees/<int:pk>/delete/', employee_delete, name='employee-delete'),
+    path('employees/<int:pk>/reports/', employee_direct_reports, name='employee-direct-reports'),
+    path('employees/<int:pk>/subtree/', employee_subtree, name='employee-subtree'),
+    path('employees/<int:pk>/chain/', employee_reporting_chain, name='employee-reporting-chain'),
     path('departments/', departments_list, name='departments-list'),
     path('roles/', roles_list, name='roles-list'),
+    path('profiles/', profiles_list, name='profiles-list'),
+    path('profiles/<str:name>/', profile_download, name='profile-download'),
 ]
@@ -1,15 +1,61 @@
+import itertools
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.http import FileResponse
 from django.db import DatabaseError, IntegrityError
 
-from .models import Employee
+from .middleware import profile_dir
+from .models import Employee, VersionConflict, subtree_range
 from .serializers import EmployeeSerializer
 
+
+class _InvalidVersion(Exception):
+    pass
+
+
+def _expected_version(request):
+    """Version the client last saw, from `If-Match: "3"` or a `version` field."""
+    if_match = request.headers.get('If-Match')
+    if if_match:
+        if if_match.strip() == '*':
+            return None
+        version = if_match.strip().removeprefix('W/').strip('"')
+    else:
+        version = request.data.get('version') if hasattr(request.data, 'get') else None
+        if version in (None, ''):
+            return None
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise _InvalidVersion()
+
+
+def _version_conflict_response(pk):
+    current = Employee.objects.for_pk(pk).filter(pk=pk).first()
+    if current is None:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_404_NOT_FOUND,
+            "message": "Employee not found",
+            "error_type": "NotFoundError"
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    response = Response({
+        "success": False,
+        "status_code": status.HTTP_412_PRECONDITION_FAILED,
+        "message": "Employee was modified by another request",
+        "error_type": "VersionConflictError",
+        "data": EmployeeSerializer(current).data
+    }, status=status.HTTP_412_PRECONDITION_FAILED)
+    response['ETag'] = f'"{current.version}"'
+    return response
+
 # ========================
 # JWT AUTH VIEWS
 # ========================
@@ -95,15 +141,21 @@ def token_refresh_view(request):
 @permission_classes([IsAuthenticated])
 def employee_list(request):
     try:
-        employees = Employee.objects.all().order_by('-date_joined')
-
         department = request.GET.get('department')
         role = request.GET.get('role')
 
-        if department:
-            employees = employees.filter(department__iexact=department)
-        if role:
-            employees = employees.filter(role__iexact=role)
+        def build(employees):
+            if department:
+                employees = employees.filter(department__iexact=department)
+            if role:
+                employees = employees.filter(role__iexact=role)
+            return employees.order_by('-date_joined', '-id')
+
+        # Plain queryset when unsharded; otherwise a parallel scatter-gather
+        # over the shards, merge-sorted by date_joined
+        employees = Employee.objects.scatter(
+            build, key=lambda e: (e.date_joined, e.id), reverse=True, department=department
+        )
 
         paginator = PageNumberPagination()
         paginator.page_size = 10
@@ -178,14 +230,16 @@ def employee_create(request):
 @permission_classes([IsAuthenticated])
 def employee_detail(request, pk):
     try:
-        employee = Employee.objects.get(pk=pk)
+        employee = Employee.objects.for_pk(pk).get(pk=pk)
         serializer = EmployeeSerializer(employee)
-        return Response({
+        response = Response({
             "success": True,
             "status_code": status.HTTP_200_OK,
             "message": "Employee retrieved successfully",
             "data": serializer.data
         }, status=status.HTTP_200_OK)
+        response['ETag'] = f'"{employee.version}"'
+        return response
 
     except Employee.DoesNotExist:
         return Response({
@@ -208,17 +262,22 @@ def employee_detail(request, pk):
 @permission_classes([IsAuthenticated])
 def employee_update(request, pk):
     try:
-        employee = Employee.objects.get(pk=pk)
-        serializer = EmployeeSerializer(employee, data=request.data, partial=True)
+        expected_version = _expected_version(request)
+        employee = Employee.objects.for_pk(pk).get(pk=pk)
+        serializer = EmployeeSerializer(
+            employee, data=request.data, partial=True, context={'expected_version': expected_version}
+        )
 
         if serializer.is_valid():
             serializer.save()
-            return Response({
+            response = Response({
                 "success": True,
                 "status_code": status.HTTP_200_OK,
                 "message": "Employee updated successfully",
                 "data": serializer.data
             }, status=status.HTTP_200_OK)
+            response['ETag'] = f'"{employee.version}"'
+            return response
 
         return Response({
             "success": False,
@@ -236,6 +295,17 @@ def employee_update(request, pk):
             "error_type": "NotFoundError"
         }, status=status.HTTP_404_NOT_FOUND)
 
+    except VersionConflict:
+        return _version_conflict_response(pk)
+
+    except _InvalidVersion:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_400_BAD_REQUEST,
+            "message": "Invalid version",
+            "error_type": "ValidationError"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     except Exception as e:
         return Response({
             "success": False,
@@ -249,9 +319,13 @@ def employee_update(request, pk):
 @permission_classes([IsAuthenticated])
 def employee_delete(request, pk):
     try:
-        employee = Employee.objects.get(pk=pk)
+        expected_version = _expected_version(request)
+        employee = Employee.objects.for_pk(pk).get(pk=pk)
         deleted_data = {"id": employee.id, "name": employee.name, "email": employee.email}
-        employee.delete()
+        if expected_version is None:
+            employee.delete()
+        else:
+            employee.delete_if_version(expected_version)
         return Response({
             "success": True,
             "status_code": status.HTTP_200_OK,
@@ -267,6 +341,138 @@ def employee_delete(request, pk):
             "error_type": "NotFoundError"
         }, status=status.HTTP_404_NOT_FOUND)
 
+    except VersionConflict:
+        return _version_conflict_response(pk)
+
+    except _InvalidVersion:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_400_BAD_REQUEST,
+            "message": "Invalid version",
+            "error_type": "ValidationError"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    except Exception as e:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": f"An unexpected error occurred: {str(e)}",
+            "error_type": "ServerError"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ========================
+# ORGANIZATIONAL HIERARCHY
+# ========================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def employee_direct_reports(request, pk):
+    try:
+        employee = Employee.objects.for_pk(pk).get(pk=pk)
+        reports = Employee.objects.using(employee._state.db).filter(manager=employee).order_by('name')
+        serializer = EmployeeSerializer(reports, many=True)
+        return Response({
+            "success": True,
+            "status_code": status.HTTP_200_OK,
+            "message": "Direct reports retrieved successfully",
+            "data": serializer.data
+        }, status=status.HTTP_200_OK)
+
+    except Employee.DoesNotExist:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_404_NOT_FOUND,
+            "message": "Employee not found",
+            "error_type": "NotFoundError"
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    except Exception as e:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": f"An unexpected error occurred: {str(e)}",
+            "error_type": "ServerError"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def employee_subtree(request, pk):
+    try:
+        employee = Employee.objects.for_pk(pk).get(pk=pk)
+        # Single indexed range seek on the materialized path, whatever the depth
+        employees = Employee.objects.using(employee._state.db).filter(**subtree_range(employee.path)).exclude(pk=employee.pk).order_by('path')
+
+        department = request.GET.get('department')
+        role = request.GET.get('role')
+
+        if department:
+            employees = employees.filter(department__iexact=department)
+        if role:
+            employees = employees.filter(role__iexact=role)
+
+        paginator = PageNumberPagination()
+        paginator.page_size = 10
+        paginated_employees = paginator.paginate_queryset(employees, request)
+
+        serializer = EmployeeSerializer(paginated_employees, many=True)
+
+        return paginator.get_paginated_response({
+            "success": True,
+            "status_code": status.HTTP_200_OK,
+            "message": "Subtree retrieved successfully",
+            "data": serializer.data
+        })
+
+    except Employee.DoesNotExist:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_404_NOT_FOUND,
+            "message": "Employee not found",
+            "error_type": "NotFoundError"
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    except DatabaseError as e:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": f"Database error: {str(e)}",
+            "error_type": "DatabaseError"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    except Exception as e:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": f"An unexpected error occurred: {str(e)}",
+            "error_type": "ServerError"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def employee_reporting_chain(request, pk):
+    try:
+        employee = Employee.objects.for_pk(pk).get(pk=pk)
+        # Ancestor ids are encoded in the path; nearest manager first, root last
+        chain = Employee.objects.using(employee._state.db).filter(pk__in=employee.ancestor_ids()).order_by('-depth')
+        serializer = EmployeeSerializer(chain, many=True)
+        return Response({
+            "success": True,
+            "status_code": status.HTTP_200_OK,
+            "message": "Reporting chain retrieved successfully",
+            "data": serializer.data
+        }, status=status.HTTP_200_OK)
+
+    except Employee.DoesNotExist:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_404_NOT_FOUND,
+            "message": "Employee not found",
+            "error_type": "NotFoundError"
+        }, status=status.HTTP_404_NOT_FOUND)
+
     except Exception as e:
         return Response({
             "success": False,
@@ -284,12 +490,14 @@ def employee_delete(request, pk):
 @permission_classes([IsAuthenticated])
 def departments_list(request):
     try:
-        departments = Employee.objects.values_list('department', flat=True).distinct().exclude(department__isnull=True).exclude(department='')
+        departments = Employee.objects.map_shards(
+            lambda employees: list(employees.values_list('department', flat=True).distinct().exclude(department__isnull=True).exclude(department=''))
+        )
         return Response({
             "success": True,
             "status_code": status.HTTP_200_OK,
             "message": "Departments retrieved successfully",
-            "data": list(departments)
+            "data": list(dict.fromkeys(itertools.chain.from_iterable(departments)))
         }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({
@@ -304,12 +512,14 @@ def departments_list(request):
 @permission_classes([IsAuthenticated])
 def roles_list(request):
     try:
-        roles = Employee.objects.values_list('role', flat=True).distinct().exclude(role__isnull=True).exclude(role='')
+        roles = Employee.objects.map_shards(
+            lambda employees: list(employees.values_list('role', flat=True).distinct().exclude(role__isnull=True).exclude(role=''))
+        )
         return Response({
             "success": True,
             "status_code": status.HTTP_200_OK,
             "message": "Roles retrieved successfully",
-            "data": list(roles)
+            "data": list(dict.fromkeys(itertools.chain.from_iterable(roles)))
         }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({
@@ -318,3 +528,46 @@ def roles_list(request):
             "message": f"An unexpected error occurred: {str(e)}",
             "error_type": "ServerError"
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ========================
+# PROFILING (ADMIN ONLY)
+# ========================
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profiles_list(request):
+    try:
+        directory = profile_dir()
+        files = sorted(directory.glob('*.prof'), key=lambda f: f.stat().st_mtime, reverse=True) if directory.exists() else []
+        return Response({
+            "success": True,
+            "status_code": status.HTTP_200_OK,
+            "message": "Profiles retrieved successfully",
+            "data": [
+                {"name": f.name, "size": f.stat().st_size, "created": f.stat().st_mtime}
+                for f in files
+            ]
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+            "message": f"An unexpected error occurred: {str(e)}",
+            "error_type": "ServerError"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_download(request, name):
+    profile = profile_dir() / name
+    # `name` comes from the URL, so refuse anything that is not a plain file in the profile dir
+    if profile.parent != profile_dir() or profile.suffix != '.prof' or not profile.is_file():
+        return Response({
+            "success": False,
+            "status_code": status.HTTP_404_NOT_FOUND,
+            "message": "Profile not found",
+            "error_type": "NotFoundError"
+        }, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(profile.open('rb'), as_attachment=True, filename=profile.name)
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.CompressionMiddleware',  # must wrap everything that touches the body
     'django.middleware.security.SecurityMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # <-- add this
@@ -50,6 +51,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',      # no-op unless API_PROFILING is enabled
+    'api.middleware.SlowQueryLogMiddleware',   # no-op unless SLOW_QUERY_LOG is enabled
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -86,6 +89,26 @@ DATABASES = {
     }
 }
 
+# -----------------------
+# EMPLOYEE SHARDING (optional)
+# -----------------------
+# EMPLOYEE_SHARD_COUNT=3 spreads employees over shard_0..shard_2 (one SQLite
+# file each locally) by a hash of department. The default database keeps the
+# shard directory, auth and everything else. See api/sharding.py.
+#
+# EMPLOYEE_SHARDS is the on/off switch. The aliases themselves always exist
+# (at least three) so the sharding tests can turn it on with override_settings.
+EMPLOYEE_SHARD_COUNT = int(os.environ.get('EMPLOYEE_SHARD_COUNT', '0'))
+EMPLOYEE_SHARDS = [f'shard_{i}' for i in range(EMPLOYEE_SHARD_COUNT)]
+
+for shard in [f'shard_{i}' for i in range(max(3, EMPLOYEE_SHARD_COUNT))]:
+    DATABASES[shard] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{shard}.sqlite3',
+    }
+
+DATABASE_ROUTERS = ['api.sharding.EmployeeShardRouter']
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -93,7 +116,25 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ColumnarJSONRenderer',  # ?format=columnar
+    ),
+}
+
+# -----------------------
+# RESPONSE COMPRESSION
+# -----------------------
+# Codecs in server preference order; 'br' and 'zstd' are skipped unless the
+# `brotli` / `zstandard` packages are installed. Benchmark with
+# `python manage.py benchmark_compression`.
+RESPONSE_COMPRESSION = {
+    'ENABLED': os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'True') == 'True',
+    'MIN_SIZE': int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', '1024')),  # bytes
+    'CODECS': ['zstd', 'br', 'gzip'],
+    'LEVELS': {'zstd': 3, 'br': 4, 'gzip': 6},
 }
 
 from datetime import timedelta
@@ -105,6 +146,27 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# -----------------------
+# PROFILING & SLOW QUERY LOG (opt-in)
+# -----------------------
+# Send the `X-Profile` header as a staff user, or set a sampling rate, to
+# capture a cProfile dump per request. Dumps are listed at /api/profiles/.
+API_PROFILING = {
+    'ENABLED': os.environ.get('API_PROFILING_ENABLED', 'False') == 'True',
+    'HEADER': 'X-Profile',
+    'SAMPLE_RATE': float(os.environ.get('API_PROFILING_SAMPLE_RATE', '0')),
+    'OUTPUT_DIR': BASE_DIR / 'profiles',
+    'MAX_FILES': int(os.environ.get('API_PROFILING_MAX_FILES', '200')),  # oldest dumps are deleted
+    'PROFILER': 'cProfile.Profile',  # any class with enable()/disable()/dump_stats()
+}
+
+# Logs SQL slower than the threshold with its EXPLAIN plan to the
+# `api.slow_queries` logger.
+SLOW_QUERY_LOG = {
+    'ENABLED': os.environ.get('SLOW_QUERY_LOG_ENABLED', 'False') == 'True',
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100')),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 